@@ -1,11 +1,66 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hashlib
+import hmac
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 import os
 import json
 
-app = FastAPI(title="Digital Twin API")
+
+# Webhook commits buffered for the in-process twin; beyond this the endpoint
+# answers 503 instead of growing memory while the twin falls behind.
+WEBHOOK_QUEUE_SIZE = 1000
+
+
+def _log_twin_exit(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"❌ Digital twin stopped: {task.exception()!r}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own one outbound HTTP client for the app's lifetime.
+
+    Handlers should use `request.app.state.http` rather than opening their own
+    AsyncClient, so every request shares the same keep-alive pool.
+
+    With RUN_TWIN=true the digital twin loop also runs in this process, fed by
+    `/webhooks/github` through `app.state.github_events` instead of polling.
+    """
+    app.state.http = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=32),
+    )
+    app.state.github_events = None
+    app.state.twin_task = twin_task = None
+    if os.getenv("RUN_TWIN", "false").lower() in ("1", "true", "yes"):
+        import digital_twin  # pulls in the Dedalus SDK; only needed when hosting the twin
+
+        app.state.github_events = asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+        twin_task = asyncio.create_task(digital_twin.run_server(app.state.github_events))
+        # Surface a crash when it happens, not only at shutdown
+        twin_task.add_done_callback(_log_twin_exit)
+        app.state.twin_task = twin_task
+    try:
+        yield
+    finally:
+        if twin_task is not None:
+            twin_task.cancel()
+            try:
+                await twin_task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                pass  # already reported by _log_twin_exit
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Digital Twin API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,19 +70,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Demo twin state (level 1=happy/Focused, 2=mild/Strained, 3=stressed/Overloaded)
-_demo_state = {
-    "stressBand": "Focused",
-    "burnoutValue": 28,
-    "avatar": "/avatar-happy.png",
-}
-
 LEVEL_PRESETS = {
     1: {"stressBand": "Focused", "burnoutValue": 28, "avatar": "/avatar-happy.png"},
     2: {"stressBand": "Strained", "burnoutValue": 55, "avatar": "/avatar-mildly-stressed.png"},
     3: {"stressBand": "Overloaded", "burnoutValue": 85, "avatar": "/avatar-stressed.png"},
 }
 
+# The demo state is always one of the presets, so encode each one once and
+# serve the bytes directly instead of copying + re-serializing a dict per poll.
+_STATE_BYTES = {level: json.dumps(preset).encode() for level, preset in LEVEL_PRESETS.items()}
+
+# Demo twin level (1=happy/Focused, 2=mild/Strained, 3=stressed/Overloaded)
+_current_level = 1
+
+
+# Raw persona_last_push.json bytes keyed by (path, st_mtime_ns, st_size); the
+# orchestrator rewrites the file rarely, while the frontend polls it constantly.
+_PERSONA_CACHE = None
+
 
 class DemoLevelBody(BaseModel):
     level: int = Field(..., ge=1, le=3, description="1=Happy/Focused, 2=Mild/Strained, 3=Stressed/Close to burnout")
@@ -36,33 +96,91 @@ class DemoLevelBody(BaseModel):
 @app.get("/state")
 async def get_state():
     """Current demo twin state for the frontend (poll this)."""
-    return _demo_state.copy()
+    return Response(content=_STATE_BYTES[_current_level], media_type="application/json")
 
 
 @app.post("/state")
 async def set_state(body: DemoLevelBody):
     """Set demo twin by level: 1=happy+Focused, 2=mild+Strained, 3=stressed+Overloaded. Use from Swagger UI."""
-    _demo_state.update(LEVEL_PRESETS[body.level])
-    return _demo_state.copy()
+    global _current_level
+    _current_level = body.level
+    return Response(content=_STATE_BYTES[body.level], media_type="application/json")
 
 
 @app.get("/api/persona")
-async def get_persona():
+def get_persona():
     """Return the latest persona push payload for frontend consumption.
 
     Reads `persona_last_push.json` from the repo root and returns it as JSON.
+    The file's bytes are cached until its mtime or size changes. Declared as a
+    plain `def` so Starlette runs the stat/read in its threadpool instead of
+    blocking the event loop on disk I/O.
     """
+    global _PERSONA_CACHE
     path = os.path.join(os.getcwd(), "persona_last_push.json")
-    if not os.path.exists(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="persona_last_push.json not found")
+    key = (path, st.st_mtime_ns, st.st_size)
+    if _PERSONA_CACHE is not None and _PERSONA_CACHE[0] == key:
+        return Response(content=_PERSONA_CACHE[1], media_type="application/json")
     try:
-        with open(path, "r") as f:
-            data = json.load(f)
-        return JSONResponse(content=data)
+        # The file is already JSON: serve its bytes verbatim rather than
+        # parsing it only for FastAPI to re-encode the same document.
+        with open(path, "rb") as f:
+            raw = f.read()
+        _PERSONA_CACHE = (key, raw)
+        return Response(content=raw, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/webhooks/github", status_code=202)
+async def github_webhook(request: Request):
+    """Receive GitHub push webhooks and queue their commits for the twin.
+
+    Payloads must be signed with GITHUB_WEBHOOK_SECRET (X-Hub-Signature-256).
+    Only available when the twin runs in-process (RUN_TWIN=true).
+    """
+    queue = request.app.state.github_events
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Digital twin is not running (set RUN_TWIN=true)")
+    if request.app.state.twin_task.done():
+        raise HTTPException(status_code=503, detail="Digital twin has stopped")
+    secret = os.getenv("GITHUB_WEBHOOK_SECRET")
+    if not secret:
+        raise HTTPException(status_code=503, detail="GITHUB_WEBHOOK_SECRET is not configured")
+
+    body = await request.body()
+    expected = b"sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest().encode()
+    # Compare bytes: compare_digest raises TypeError on non-ASCII str, which
+    # would turn a forged header into a 500 instead of a 401
+    received = request.headers.get("X-Hub-Signature-256", "").encode("latin-1")
+    if not hmac.compare_digest(expected, received):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    event = request.headers.get("X-GitHub-Event")
+    if event == "ping":
+        return {"status": "pong"}
+    if event != "push":
+        return {"status": "ignored", "event": event}
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Webhook payload must be a JSON object")
+    commits = payload.get("commits")
+    commits = [c for c in commits if isinstance(c, dict)] if isinstance(commits, list) else []
+    if len(commits) > queue.maxsize - queue.qsize():
+        raise HTTPException(status_code=503, detail="Digital twin is behind; retry later")
+    for c in commits:
+        queue.put_nowait({"type": "COMMIT", "msg": c.get("message", ""), "time": c.get("timestamp", "")})
+    return {"status": "queued", "commits": len(commits)}
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -71,4 +189,13 @@ def health():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run("api:app", host="0.0.0.0", port=port)
+    # "auto" picks uvloop + httptools (C event loop / HTTP parser) when they are
+    # installed, e.g. via `pip install "uvicorn[standard]"`, and falls back to
+    # asyncio + h11 otherwise.
+    uvicorn.run(
+        "api:app",
+        host="0.0.0.0",
+        port=port,
+        loop=os.getenv("UVICORN_LOOP", "auto"),
+        http=os.getenv("UVICORN_HTTP", "auto"),
+    )
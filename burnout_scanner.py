@@ -1,52 +1,59 @@
 import asyncio
 import os
 import json
-import httpx
+import re
 import signal
 import sys
-from datetime import datetime
 from typing import List, Dict, Any
 from dotenv import load_dotenv
 from dedalus_labs import AsyncDedalus, DedalusRunner
 
+from mcp_github import close_client, get_client
+
 # Load environment variables
 load_dotenv()
 
 # --- CONFIGURATION ---
 TARGET_REPO = "nishsm/sample-burnout-repo" 
 
+COMMITS_URL = f"https://api.github.com/repos/{TARGET_REPO}/commits?per_page=15"
+
+# Token and headers are fixed for the life of the process; build them once.
+_GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+_GH_HEADERS = {
+    "Authorization": f"token {_GITHUB_TOKEN}",
+    "Accept": "application/vnd.github.v3+json",
+} if _GITHUB_TOKEN else None
+
+
+# "Despair" keywords, matched as substrings of the lowercased commit message.
+# One compiled alternation scans each message once instead of once per keyword.
+DESPAIR_KEYWORDS = ("fix", "broken", "god", "wip", "urgent", "bug")
+_KEYWORD_RE = re.compile("|".join(map(re.escape, DESPAIR_KEYWORDS)))
+
+
+
 # --- 1. THE MANUAL FETCH (Bypasses MCP Auth Issues) ---
-async def fetch_commits_directly():
+async def fetch_commits_directly(client=None):
     """
     Fetches commits using standard HTTP requests.
     Guaranteed to work if your GITHUB_TOKEN is valid.
+    Uses `client` (an httpx.AsyncClient) when given, else mcp_github's shared fallback.
     """
-    token = os.getenv("GITHUB_TOKEN")
-    if not token:
+    if not _GH_HEADERS:
         print("❌ ERROR: GITHUB_TOKEN is missing from .env")
         return []
 
     print(f"📡 CONNECTING TO GITHUB (Direct API)... fetching {TARGET_REPO}")
     
-    url = f"https://api.github.com/repos/{TARGET_REPO}/commits?per_page=15"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        
+    response = await (client or get_client()).get(COMMITS_URL, headers=_GH_HEADERS)
+
     if response.status_code == 200:
-        raw_data = response.json()
         # Clean the data for the AI (Send less tokens)
-        clean_commits = []
-        for item in raw_data:
-            clean_commits.append({
-                "message": item["commit"]["message"],
-                "date": item["commit"]["author"]["date"]
-            })
-        return clean_commits
+        return [
+            {"message": c["message"], "date": c["author"]["date"]}
+            for c in (item["commit"] for item in response.json())
+        ]
     elif response.status_code == 404:
         print(f"❌ Error 404: Repo '{TARGET_REPO}' not found. Check the name!")
     elif response.status_code == 401:
@@ -57,6 +64,17 @@ async def fetch_commits_directly():
     return []
 
 
+def _hour(date_s):
+    """Hour field of an ISO-8601 timestamp ("2026-02-07T03:14:00Z" -> 3), or None.
+
+    Only characters 11:13 matter here, so slice them out instead of building a
+    full tz-aware datetime for every commit.
+    """
+    if len(date_s) >= 13 and date_s[10] in "T " and date_s[11:13].isdigit():
+        return int(date_s[11:13])
+    return None
+
+
 def calculate_burnout_score_locally(commits):
     """
     Lightweight local heuristic to estimate burnout damage from commits.
@@ -67,60 +85,67 @@ def calculate_burnout_score_locally(commits):
         return {"damage": 0, "signals": [], "count": 0}
 
     score = 0
-    signals = []
-    keywords = ["fix", "broken", "god", "wip", "urgent", "bug"]
+    # Insertion-ordered set: dedupes as we go instead of in a post-pass
+    signals = {}
 
     for c in commits:
         msg = (c.get("message") or "").lower()
         date_s = c.get("date") or c.get("author_date") or ""
-        # Parse hour if possible
-        try:
-            dt = datetime.fromisoformat(date_s.replace("Z", "+00:00"))
-            hour = dt.hour
-        except Exception:
-            hour = None
+        hour = _hour(date_s)
 
         # Zombie hours: 1-4 AM
         if hour is not None and 1 <= hour <= 4:
             score += 10
-            signals.append(f"Zombie commit at hour {hour}")
+            signals[f"Zombie commit at hour {hour}"] = None
 
         # Short/opaque messages
         if len(msg.strip()) > 0 and len(msg.strip()) < 5:
             score += 5
-            signals.append("Short commit message")
+            signals["Short commit message"] = None
 
         # Despair keywords
-        for kw in keywords:
-            if kw in msg:
-                score += 8
-                signals.append(f"Found keyword '{kw}' in message")
-                break
+        m = _KEYWORD_RE.search(msg)
+        if m:
+            score += 8
+            signals[f"Found keyword '{m.group(0)}' in message"] = None
 
     # Normalize and cap
     damage = min(100, score)
 
-    return {"damage": damage, "signals": list(dict.fromkeys(signals)), "count": len(commits)}
+    return {"damage": damage, "signals": list(signals), "count": len(commits)}
 
 # --- 2. THE DEDALUS BRAIN (Analysis) ---
+_runner = None
+
+
+def _get_runner():
+    """Build the Dedalus runner on first use and reuse it afterwards."""
+    global _runner
+    if _runner is None:
+        client = AsyncDedalus(
+            api_key=os.getenv("DEDALUS_API_KEY"),
+            base_url=os.getenv("DEDALUS_API_URL", "https://api.dedaluslabs.ai"),
+            as_base_url=os.getenv("DEDALUS_AS_URL", "https://as.dedaluslabs.ai")
+        )
+        _runner = DedalusRunner(client)
+    return _runner
+
+
 async def analyze_with_dedalus(commits):
     """
     Uses Dedalus to analyze the JSON data we already fetched.
     """
-    api_key = os.getenv("DEDALUS_API_KEY")
-    client = AsyncDedalus(
-        api_key=api_key,
-        base_url=os.getenv("DEDALUS_API_URL", "https://api.dedaluslabs.ai"),
-        as_base_url=os.getenv("DEDALUS_AS_URL", "https://as.dedaluslabs.ai")
-    )
-    runner = DedalusRunner(client)
+    runner = _get_runner()
 
-    # We embed the data directly into the prompt
+    # We embed the data directly into the prompt. Compact separators keep the
+    # stdlib C encoder in play (indent= forces the pure-Python one) and cut
+    # prompt tokens; the model doesn't need pretty-printing.
+    commits_json = json.dumps(commits, separators=(",", ":"))
     prompt = f"""
     I am analyzing a developer's burnout levels. 
     Here is their recent commit history in JSON format:
     
-    {json.dumps(commits, indent=2)}
+    {commits_json}
 
     TASK:
     Analyze these commits for 3 signals:
@@ -225,6 +250,8 @@ async def main():
         except asyncio.CancelledError:
             print("✅ Worker cancelled.")
 
+    await close_client()
+
 
 if __name__ == "__main__":
     try:
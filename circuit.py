@@ -0,0 +1,73 @@
+"""Minimal circuit breaker for upstream calls (Dedalus MCP servers).
+
+CLOSED:    calls flow normally; failures inside `window` seconds are counted.
+OPEN:      after `failure_threshold` failures, calls fail fast for
+           `recovery_timeout` seconds instead of waiting out a timeout.
+HALF_OPEN: one trial call is let through; success closes the circuit,
+           failure opens it again.
+"""
+import time
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, window: float = 60.0,
+                 recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.failure_count = 0
+        self._window_start = None
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """Return True if a call may go through right now."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == HALF_OPEN:
+            # Only a single probe at a time while recovering
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failure_count = 0
+        self._window_start = None
+        self._trial_in_flight = False
+
+    def record_cancelled(self):
+        """The call was abandoned by its caller, so there is no verdict on the
+        upstream: free the HALF_OPEN probe slot and change nothing else."""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self._trip(now)
+            return
+        if self._window_start is None or now - self._window_start > self.window:
+            self._window_start = now
+            self.failure_count = 0
+        self.failure_count += 1
+        if self.failure_count >= self.failure_threshold:
+            self._trip(now)
+
+    def _trip(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        self._trial_in_flight = False
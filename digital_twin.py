@@ -4,6 +4,7 @@ import json
 import httpx
 import random
 import time
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
 from dedalus_labs import AsyncDedalus, DedalusRunner
@@ -13,38 +14,60 @@ load_dotenv()
 # --- CONFIGURATION ---
 TARGET_REPO = "nishsm/sample-burnout-repo" 
 POLL_INTERVAL = 5  # Seconds between checks
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+COMMITS_URL = f"https://api.github.com/repos/{TARGET_REPO}/commits?per_page=1"
+MEMORY_SIZE = 256  # Most recent events the twin remembers
+SPEAK_DELTA = 10  # Min change in any stat (since last reaction) worth an LLM call
+STAT_BANDS = (70, 40, 20)  # Crossing one of these always triggers a reaction
+
+
+def _band(value):
+    """Index of the STAT_BANDS band a stat sits in (0 = healthy)."""
+    return sum(value < t for t in STAT_BANDS)
 
 # ==========================================
 # 1. SENSORS (The Senses)
 # ==========================================
 class SensorSuite:
-    def __init__(self):
+    def __init__(self, client: httpx.AsyncClient):
+        # Long-lived client owned by run_server; keeps the GitHub TLS
+        # connection warm across polls.
+        self.client = client
         self.last_commit_sha = None
+        # ETag of the last 200 response; GitHub answers a matching
+        # If-None-Match with a bodyless 304 that doesn't count against quota.
+        self.last_etag = None
         self.current_song = None
     
     async def check_github(self):
         """Polls GitHub for NEW commits only."""
-        token = os.getenv("GITHUB_TOKEN")
-        url = f"https://api.github.com/repos/{TARGET_REPO}/commits?per_page=1"
-        headers = {"Authorization": f"token {token}"}
+        # Auth/Accept live on the client; only the conditional header varies
+        headers = {"If-None-Match": self.last_etag} if self.last_etag else None
         
         try:
-            async with httpx.AsyncClient() as client:
-                res = await client.get(url, headers=headers)
-                if res.status_code == 200:
-                    data = res.json()[0]
-                    sha = data['sha']
-                    # Only report if it's a NEW commit we haven't seen
-                    if self.last_commit_sha and sha != self.last_commit_sha:
-                        self.last_commit_sha = sha
-                        return {
-                            "type": "COMMIT",
-                            "msg": data['commit']['message'],
-                            "time": data['commit']['author']['date']
-                        }
+            res = await self.client.get(COMMITS_URL, headers=headers)
+            if res.status_code == 304:
+                return None
+            if res.status_code == 200:
+                self.last_etag = res.headers.get("ETag")
+                commits = res.json()
+                if not commits:
+                    return None
+                data = commits[0]
+                sha = data['sha']
+                # Only report if it's a NEW commit we haven't seen
+                if self.last_commit_sha and sha != self.last_commit_sha:
                     self.last_commit_sha = sha
-        except:
-            pass
+                    return {
+                        "type": "COMMIT",
+                        "msg": data['commit']['message'],
+                        "time": data['commit']['author']['date']
+                    }
+                self.last_commit_sha = sha
+        except (httpx.HTTPError, ValueError, KeyError, IndexError) as e:
+            # Network/decode/shape problems are non-fatal for a poll; anything
+            # else (incl. CancelledError) propagates so shutdown stays clean.
+            print(f"   ⚠️  GitHub poll failed: {e!r}")
         return None
 
     def check_spotify(self):
@@ -60,8 +83,9 @@ class SensorSuite:
             {"track": "Hurt (Johnny Cash)", "vibe": "Depressive"},
             {"track": "Silence", "vibe": "Numb"}
         ]
-        # Change song every 15 seconds for the demo
-        index = int(time.time() / 15) % len(songs)
+        # Change song every 15 seconds for the demo (integer monotonic clock,
+        # so wall-clock/NTP jumps can't skip or repeat a song)
+        index = (time.monotonic_ns() // 15_000_000_000) % len(songs)
         new_song = songs[index]
         
         if new_song != self.current_song:
@@ -76,8 +100,19 @@ class DigitalTwin:
     def __init__(self):
         # The Twin starts healthy
         self.stats = {"energy": 100, "social": 100, "resilience": 100}
-        self.memory = [] 
+        self.memory = deque(maxlen=MEMORY_SIZE)
         self.status = "ONLINE"
+        # Stats as of the last speak(); used to skip reactions to no-op nudges
+        self.last_spoken_stats = dict(self.stats)
+
+        # Build the Dedalus client once so its connection pool survives
+        # across speak() calls instead of re-handshaking every heartbeat.
+        self._client = AsyncDedalus(
+            api_key=os.getenv("DEDALUS_API_KEY"),
+            base_url=os.getenv("DEDALUS_API_URL", "https://api.dedaluslabs.ai"),
+            as_base_url=os.getenv("DEDALUS_AS_URL", "https://as.dedaluslabs.ai")
+        )
+        self._runner = DedalusRunner(self._client)
 
     def process_event(self, event):
         """Ingests a new event and updates stats immediately."""
@@ -109,16 +144,22 @@ class DigitalTwin:
             
         return True # Return True if we need to speak
 
+    def has_news(self):
+        """True if the stats moved enough since the last reaction to say something new.
+
+        That means any stat shifting by SPEAK_DELTA or crossing a STAT_BANDS
+        boundary; smaller nudges (e.g. a neutral vibe shift) don't justify a
+        GPT-4o round trip.
+        """
+        for k, v in self.stats.items():
+            prev = self.last_spoken_stats.get(k, 100)
+            if abs(v - prev) >= SPEAK_DELTA or _band(v) != _band(prev):
+                return True
+        return False
+
     async def speak(self):
         """Reacts to the accumulated trauma."""
-        api_key = os.getenv("DEDALUS_API_KEY")
-        client = AsyncDedalus(
-            api_key=api_key,
-            base_url=os.getenv("DEDALUS_API_URL", "https://api.dedaluslabs.ai"),
-            as_base_url=os.getenv("DEDALUS_AS_URL", "https://as.dedaluslabs.ai")
-        )
-        runner = DedalusRunner(client)
-
+        self.last_spoken_stats = dict(self.stats)
         prompt = f"""
         You are a Digital Twin of a developer. 
         You are currently running on a server, monitoring their life.
@@ -139,43 +180,81 @@ class DigitalTwin:
         
         try:
             # We use the faster model for the loop
-            result = await runner.run(input=prompt, model="openai/gpt-4o")
+            result = await self._runner.run(input=prompt, model="openai/gpt-4o")
             return result.output.strip()
-        except:
+        # Exception (not a bare except) still lets CancelledError and
+        # KeyboardInterrupt through; any SDK/config failure just mutes the twin
+        except Exception as e:
+            print(f"   ⚠️  Twin voice unavailable: {e!r}")
             return "..."
 
 # ==========================================
 # 3. THE SERVER LOOP (The Heartbeat)
 # ==========================================
-async def run_server():
-    twin = DigitalTwin()
-    sensors = SensorSuite()
+async def _next_pushed_events(queue):
+    """Wait up to POLL_INTERVAL for webhook events, then take anything else queued."""
+    try:
+        events = [await asyncio.wait_for(queue.get(), timeout=POLL_INTERVAL)]
+    except asyncio.TimeoutError:
+        return []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+async def run_server(github_events=None):
+    """Run the twin loop.
+
+    By default GitHub is polled every POLL_INTERVAL. When `github_events` (an
+    asyncio.Queue fed by the API's /webhooks/github) is given, commits are
+    pushed to the twin as they happen and only Spotify stays timer-driven.
+    """
+    headers = {"Accept": "application/vnd.github.v3+json"}
+    if GITHUB_TOKEN:
+        headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    async with httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+        headers=headers,
+    ) as client:
+        twin = DigitalTwin()
+        sensors = SensorSuite(client)
     
-    print("\n" + "="*50)
-    print("🖥️  DIGITAL TWIN SERVER: ONLINE")
-    print("📡  Listening for GitHub & Spotify events...")
-    print("="*50)
-
-    # Infinite "Game Loop"
-    while True:
-        # 1. Poll Sensors
-        github_event = await sensors.check_github()
-        spotify_event = sensors.check_spotify()
+        print("\n" + "="*50)
+        print("🖥️  DIGITAL TWIN SERVER: ONLINE")
+        print("📡  Listening for GitHub & Spotify events...")
+        print("="*50)
+
+        # Infinite "Game Loop"
+        while True:
+            # 1. Gather events
+            if github_events is None:
+                # Poll concurrently, so Spotify isn't queued behind GitHub's
+                # round trip; drop the to_thread once it is async
+                events = list(await asyncio.gather(
+                    sensors.check_github(),
+                    asyncio.to_thread(sensors.check_spotify),
+                ))
+            else:
+                # Webhook mode: wake as soon as a push arrives
+                events = await _next_pushed_events(github_events)
+                events.append(sensors.check_spotify())
         
-        # 2. Update Twin
-        should_speak = False
-        if twin.process_event(github_event): should_speak = True
-        if twin.process_event(spotify_event): should_speak = True
+            # 2. Update Twin
+            should_speak = False
+            for event in events:
+                if twin.process_event(event): should_speak = True
         
-        # 3. React (If something happened)
-        if should_speak:
-            print(f"   [VITALS] Energy: {twin.stats['energy']}% | Resilience: {twin.stats['resilience']}%")
-            reaction = await twin.speak()
-            print(f"   🗣️  TWIN: \"{reaction}\"")
-            print("-" * 50)
-
-        # 4. Wait (Heartbeat)
-        await asyncio.sleep(POLL_INTERVAL)
+            # 3. React (If something meaningful happened)
+            if should_speak and twin.has_news():
+                print(f"   [VITALS] Energy: {twin.stats['energy']}% | Resilience: {twin.stats['resilience']}%")
+                reaction = await twin.speak()
+                print(f"   🗣️  TWIN: \"{reaction}\"")
+                print("-" * 50)
+
+            # 4. Wait (Heartbeat); webhook mode already waited on the queue
+            if github_events is None:
+                await asyncio.sleep(POLL_INTERVAL)
 
 if __name__ == "__main__":
     try:
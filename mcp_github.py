@@ -3,39 +3,97 @@ import os
 import json
 import httpx
 from dotenv import load_dotenv
-from dedalus_labs import AsyncDedalus, DedalusRunner, AuthenticationError
+
+import minds_ai
+from circuit import CircuitOpenError
+from mcp_spotify import JSON_ARRAY_RE
+from retry import retry_async
 
 load_dotenv()
 
 # --- CONFIGURATION ---
 # Replace with your actual repo: "username/repo-name"
 TARGET_REPO = os.getenv("TARGET_REPO", "nishsm/sample-burnout-repo")
-GITHUB_PER_PAGE = int(os.getenv("GITHUB_PER_PAGE", "15"))
+# GitHub caps per_page at 100; clamping keeps a single fetch's payload bounded
+GITHUB_PER_PAGE = max(1, min(100, int(os.getenv("GITHUB_PER_PAGE", "15"))))
+
+GITHUB_API = "https://api.github.com"
+
+# Fallback GitHub REST client for callers that don't pass their own (the
+# orchestrator injects its shared one); also used by burnout_scanner, so there
+# is a single fallback pool. Reused across calls so each scan rides the pooled
+# keep-alive connection instead of a fresh TCP + TLS handshake.
+_gh_client = None
+
+# Bulkhead for GitHub REST calls, separate from the Dedalus one in minds_ai
+_github_sem = asyncio.Semaphore(8)
+
+# Conditional-request cache: GitHub answers a matching If-None-Match with a
+# bodyless 304 (free against the rate limit), so unchanged scans reuse these.
+_last_etag = None
+_last_commits = None
+
+
+def get_client():
+    """Return the shared fallback GitHub client, creating it on first use."""
+    global _gh_client
+    if _gh_client is None:
+        _gh_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+        )
+    return _gh_client
 
 
-async def fetch_commits_directly():
+async def close_client():
+    """Close the shared fallback GitHub client, if one was created."""
+    global _gh_client
+    if _gh_client is not None:
+        await _gh_client.aclose()
+        _gh_client = None
+
+
+async def fetch_commits_directly(client=None):
     """
     Fetch commits directly via the GitHub REST API using GITHUB_TOKEN.
     Returns a list of dicts: [{"message": ..., "author_name": ..., "date": ...}, ...]
     If no token is configured or an error occurs, returns an empty list.
+    Uses `client` (an httpx.AsyncClient) when given, else a module-level one.
     """
+    global _last_etag, _last_commits
     token = os.getenv("GITHUB_TOKEN")
     if not token:
         # No token configured; signal caller to fall back to MCP
         return []
 
-    url = f"https://api.github.com/repos/{TARGET_REPO}/commits?per_page={GITHUB_PER_PAGE}"
+    client = client or get_client()
     headers = {
         "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json"
+        "Accept": "application/vnd.github.v3+json",
     }
+    if _last_etag and _last_commits is not None:
+        headers["If-None-Match"] = _last_etag
+
+    async def _get():
+        async with _github_sem:
+            resp = await client.get(
+                f"{GITHUB_API}/repos/{TARGET_REPO}/commits",
+                params={"per_page": GITHUB_PER_PAGE},
+                headers=headers,
+            )
+        # Rate limiting and server errors are transient; let retry_async back off
+        if resp.status_code == 429 or resp.status_code >= 500:
+            resp.raise_for_status()
+        return resp
+
+    try:
+        resp = await retry_async(_get, retry_on=(httpx.TransportError, httpx.HTTPStatusError))
+    except Exception as e:
+        print(f"❌ GitHub direct fetch failed (network): {e}")
+        return []
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            resp = await client.get(url, headers=headers)
-        except Exception as e:
-            print(f"❌ GitHub direct fetch failed (network): {e}")
-            return []
+    if resp.status_code == 304:
+        return _last_commits
 
     if resp.status_code != 200:
         print(f"❌ GitHub direct fetch failed ({resp.status_code}): {resp.text}")
@@ -57,28 +115,25 @@ async def fetch_commits_directly():
             "author_name": author_name,
             "date": author.get("date") or ""
         })
+    _last_etag = resp.headers.get("ETag")
+    _last_commits = commits
     return commits
 
 
-async def get_github_data_via_mcp():
+async def get_github_data_via_mcp(client=None):
     """
     First try direct GitHub API (reliable if GITHUB_TOKEN present).
     If that fails or returns empty, use the Dedalus MCP GitHub tool.
     Returns either a list of commit dicts or the raw MCP output.
     """
     # Try direct fetch first
-    direct = await fetch_commits_directly()
+    direct = await fetch_commits_directly(client)
     if direct:
         print("✅ Fetched commits directly from GitHub (GITHUB_TOKEN).")
         return direct
 
-    api_key = os.getenv("DEDALUS_API_KEY")
-    client = AsyncDedalus(
-        api_key=api_key,
-        base_url=os.getenv("DEDALUS_API_URL", "https://api.dedaluslabs.ai"),
-        as_base_url=os.getenv("DEDALUS_AS_URL", "https://as.dedaluslabs.ai")
-    )
-    runner = DedalusRunner(client)
+    # Only the MCP path needs the Dedalus SDK; keep it off the direct-API path
+    from dedalus_labs import AuthenticationError
 
     print(f"\n🔌 CONNECTING TO MCP SERVER: issac/github-mcp...")
     print(f"🎯 TARGET: {TARGET_REPO}")
@@ -92,12 +147,12 @@ async def get_github_data_via_mcp():
     - date
     """
 
+    model = os.getenv("MCP_MODEL", "openai/gpt-4o")
+    mcp_servers = [os.getenv("GITHUB_MCP_SLUG", "issac/github-mcp")]
     try:
-        result = await runner.run(
-            input=prompt,
-            model=os.getenv("MCP_MODEL", "openai/gpt-4o"),
-            mcp_servers=[os.getenv("GITHUB_MCP_SLUG", "issac/github-mcp")]
-        )
+        # Goes through minds_ai so the per-MCP circuit breaker and transient
+        # retries apply
+        result = await minds_ai.run_prompt(prompt, model=model, mcp_servers=mcp_servers)
         return result.output
 
     except AuthenticationError as e:
@@ -110,18 +165,21 @@ async def get_github_data_via_mcp():
             if url:
                 print(f"👉 Open this URL to authorize: {url}")
                 input("\nPress ENTER after completing OAuth in the browser...")
-                return await get_github_data_via_mcp()
+                # Single follow-up attempt; a second auth failure propagates
+                result = await minds_ai.run_prompt(prompt, model=model, mcp_servers=mcp_servers)
+                return result.output
         raise e
 
 
-async def fetch_commits_via_mcp():
+async def fetch_commits_via_mcp(client=None):
     """
     High-level wrapper that returns a list of commits as dicts:
     [{"message": ..., "author_name": ..., "date": ...}, ...]
     Attempts direct GitHub fetch first, then MCP if needed.
+    `client` is an optional shared httpx.AsyncClient for the direct fetch.
     """
     try:
-        raw = await get_github_data_via_mcp()
+        raw = await get_github_data_via_mcp(client)
 
         # If direct fetch returned structured list, return it
         if isinstance(raw, list):
@@ -138,12 +196,22 @@ async def fetch_commits_via_mcp():
                 if isinstance(parsed, list):
                     return parsed
             except Exception:
-                pass
+                m = JSON_ARRAY_RE.search(raw)
+                if m:
+                    try:
+                        parsed = json.loads(m.group(0))
+                        if isinstance(parsed, list):
+                            return parsed
+                    except Exception:
+                        pass
 
         print("⚠️  Response could not be parsed as JSON/list. Raw output below:")
         print(raw)
         return []
 
+    except CircuitOpenError as e:
+        print(f"⏭️  GitHub MCP skipped: {e}")
+        return []
     except Exception as e:
         print(f"❌ MCP/Error: {e}")
         return []
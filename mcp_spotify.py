@@ -1,9 +1,15 @@
 import json
 import asyncio
 import os
+import re
 from typing import Any, List, Dict, Optional
 
 import minds_ai
+from circuit import CircuitOpenError
+
+# Recovers a JSON array the model wrapped in prose / code fences (shared with
+# mcp_github, which parses its MCP output the same way)
+JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
 
 
 async def _call_run_prompt(prompt: str, mcp_servers: List[str], timeout: int):
@@ -48,6 +54,8 @@ async def get_spotify_data_via_mcp(
         return getattr(result, "output", result)
     except asyncio.TimeoutError:
         raise RuntimeError("Spotify MCP request timed out")
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise RuntimeError(f"Spotify MCP error: {e}")
 
@@ -70,12 +78,10 @@ async def fetch_spotify_via_mcp() -> List[Dict]:
                     return [_normalize_track(parsed)]
             except Exception:
                 # attempt to extract JSON substring
-                import re
-
-                m = re.search(r"(\[.*\])", raw, re.DOTALL)
+                m = JSON_ARRAY_RE.search(raw)
                 if m:
                     try:
-                        parsed = json.loads(m.group(1))
+                        parsed = json.loads(m.group(0))
                         if isinstance(parsed, list):
                             return [_normalize_track(i) for i in parsed]
                     except Exception:
@@ -83,6 +89,9 @@ async def fetch_spotify_via_mcp() -> List[Dict]:
         print("⚠️  Spotify MCP response couldn't be parsed as JSON. Raw output:")
         print(raw)
         return []
+    except CircuitOpenError as e:
+        print(f"⏭️  Spotify MCP skipped: {e}")
+        return []
     except Exception as e:
         print(f"❌ Spotify MCP Error: {e}")
         return []
@@ -1,23 +1,93 @@
+import asyncio
 import os
-from dedalus_labs import AsyncDedalus, DedalusRunner
+
+from circuit import CircuitBreaker, CircuitOpenError
+from retry import retry_async
+
+# dedalus_labs (and its dependency tree) is imported on first use, so runs
+# that never reach Dedalus (e.g. direct GitHub API only) don't pay for it.
+_dedalus = None
+
+
+def _sdk():
+    global _dedalus
+    if _dedalus is None:
+        import dedalus_labs
+        _dedalus = dedalus_labs
+    return _dedalus
+
+
+def _transient_errors():
+    """Worth retrying: dropped connections, 429 and 5xx.
+
+    Auth and bad-request errors are not, and surface immediately. Neither
+    is our own per-attempt timeout: another full attempt would overrun every
+    caller's budget (e.g. the orchestrator's TICK_BUDGET).
+    """
+    sdk = _sdk()
+    return (sdk.APIConnectionError, sdk.RateLimitError, sdk.InternalServerError)
+
+# Bulkhead: cap concurrent Dedalus calls so gathered sensors + persona +
+# react can't all pile onto a degraded backend at once; extra callers queue.
+_dedalus_sem = asyncio.Semaphore(int(os.getenv("DEDALUS_MAX_INFLIGHT", "4")))
+
+# One breaker per MCP server set, so a misbehaving backend (e.g. Spotify MCP)
+# fails fast on its own without disabling the others.
+_breakers = {}
+
+
+# Long-lived client/runner shared by every run_prompt call, so the SDK's
+# HTTP connection pool (and its TLS sessions) survive across heartbeats.
+_client = None
+_runner = None
 
 
 def get_runner():
-    """Return a DedalusRunner configured from env vars."""
-    api_key = os.getenv("DEDALUS_API_KEY")
-    client = AsyncDedalus(
-        api_key=api_key,
-        base_url=os.getenv("DEDALUS_API_URL", "https://api.dedaluslabs.ai"),
-        as_base_url=os.getenv("DEDALUS_AS_URL", "https://as.dedaluslabs.ai")
-    )
-    return DedalusRunner(client)
+    """Return the shared DedalusRunner, configuring it from env vars on first use."""
+    global _client, _runner
+    # No await between check and assignment, so this can't race within a loop
+    if _runner is None:
+        sdk = _sdk()
+        _client = sdk.AsyncDedalus(
+            api_key=os.getenv("DEDALUS_API_KEY"),
+            base_url=os.getenv("DEDALUS_API_URL", "https://api.dedaluslabs.ai"),
+            as_base_url=os.getenv("DEDALUS_AS_URL", "https://as.dedaluslabs.ai"),
+            # run_prompt's retry_async is the only retry policy; the SDK's own
+            # retries on the same errors would multiply requests per call
+            max_retries=0,
+        )
+        _runner = sdk.DedalusRunner(_client)
+    return _runner
+
+
+async def close_runner():
+    """Close the shared Dedalus client; the next run_prompt builds a new one."""
+    global _client, _runner
+    client, _client, _runner = _client, None, None
+    close = getattr(client, "close", None)
+    if close is not None:
+        await close()
+
+
+def _breaker_for(mcp_servers):
+    key = tuple(mcp_servers or ())
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(",".join(key) or "dedalus")
+    return breaker
 
 
 async def run_prompt(prompt, model="openai/gpt-4o", mcp_servers=None):
     """Convenience wrapper to run a prompt via the Dedalus runner.
 
-    Returns the Dedalus run result object (may have .output).
+    Returns the Dedalus run result object (may have .output). Raises
+    CircuitOpenError without calling Dedalus while the breaker for this
+    `mcp_servers` set is open.
     """
+    breaker = _breaker_for(mcp_servers)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit open for {breaker.name}; skipping Dedalus call")
+
     runner = get_runner()
     # Keep a sensible default timeout (seconds) for Dedalus calls
     timeout = 30
@@ -27,9 +97,24 @@ async def run_prompt(prompt, model="openai/gpt-4o", mcp_servers=None):
             return await runner.run(input=prompt, model=model)
         return await runner.run(input=prompt, model=model, mcp_servers=mcp_servers)
 
+    async def _attempt():
+        # Hold a slot only while a request is in flight (not during backoff);
+        # the timeout starts once we have one, so queueing isn't a failure
+        async with _dedalus_sem:
+            return await asyncio.wait_for(_call(), timeout=timeout)
+
     try:
-        # Use asyncio.wait_for to enforce timeout
-        import asyncio as _asyncio
-        return await _asyncio.wait_for(_call(), timeout=timeout)
-    except _asyncio.TimeoutError:
+        result = await retry_async(_attempt, attempts=3, retry_on=_transient_errors())
+    except asyncio.TimeoutError:
+        breaker.record_failure()
         raise RuntimeError(f"Dedalus call timed out after {timeout}s")
+    except asyncio.CancelledError:
+        # The caller gave up (e.g. the orchestrator's tick budget), possibly
+        # before we even got a semaphore slot: not the backend's fault
+        breaker.record_cancelled()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
@@ -1,10 +1,10 @@
 import asyncio
 import os
 import json
-import time
 import random
+import signal
+import httpx
 from dotenv import load_dotenv
-from dedalus_labs import AsyncDedalus, DedalusRunner
 
 # Import your existing GitHub scanner and MCP helpers
 import burnout_scanner
@@ -19,6 +19,47 @@ load_dotenv()
 
 # --- CONFIGURATION ---
 HEARTBEAT_RATE = 10  # Seconds between scans
+TICK_BUDGET = HEARTBEAT_RATE * 0.9  # Max seconds one tick may take
+SPOTIFY_EVENT_PROBABILITY = 0.3  # Chance per tick of a simulated song
+SLACK_EVENT_PROBABILITY = 0.2  # Chance per tick of a simulated boss message
+
+# Dedicated generator for the simulated sensors; set SIM_SEED to replay a demo
+_rng = random.Random(os.getenv("SIM_SEED"))
+
+# Fixed part of the react() prompt; the per-tick vitals and events follow it.
+REACT_INSTRUCTIONS = (
+    "You are a Digital Twin of a developer. React to the new events below, "
+    "given your current vitals.\n"
+    "- If Energy is low, complain about coding.\n"
+    "- If Resilience is low, get emotional/sad about the music.\n"
+    "- If Social is low, be angry at the boss.\n"
+    "Output ONLY the spoken reaction (1-2 sentences).\n"
+)
+
+def _run(coro):
+    """asyncio.run, on uvloop's faster event loop when it's installed.
+
+    uvloop ships with uvicorn[standard] (see README); without it this is
+    plain asyncio.run.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(coro)
+    return uvloop.run(coro)
+
+
+def _write_atomic(path, text):
+    """Write `text` to `path` via a temp file + rename.
+
+    Readers (the API serving persona_last_push.json) see either the old or
+    the new file, never a half-written one.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
 
 class DigitalTwinOrchestrator:
     def __init__(self):
@@ -32,28 +73,39 @@ class DigitalTwinOrchestrator:
         
         # 2. Persona manager
         self.persona = PersonaManager("digital-twin")
-        self._once = False
+
+        # 3. Sensor config, read once so a mid-run env change can't leave
+        #    sensors disagreeing within a tick
+        self.use_mcp = os.getenv("USE_MCP", "false").lower() in {"1", "true", "yes"}
+        self._songs = ("Hurt - Johnny Cash", "Stress - Justice", "Given Up - Linkin Park")
+
+        # 4. One HTTP pool for every direct sensor call (handed to the
+        #    fetchers), closed deterministically in aclose()
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20),
+        )
 
     # --- SENSOR 1: GITHUB (Real) ---
     async def check_github(self):
         """Checks for real commits using your scanner."""
         print("   🔎 Scanning GitHub for new activity...")
 
-        use_mcp = os.getenv("USE_MCP", "false").lower() in ("1", "true", "yes")
         commits = []
 
-        if use_mcp:
+        if self.use_mcp:
             print("   🧩 Using Dedalus MCP to fetch commits...")
             try:
-                commits = await mcp_github.fetch_commits_via_mcp()
+                commits = await mcp_github.fetch_commits_via_mcp(self.http)
             except Exception as e:
                 print(f"   ⚠️  MCP fetch failed: {e}. Falling back to direct API.")
 
         if not commits:
-            commits = await burnout_scanner.fetch_commits_directly()
+            commits = await burnout_scanner.fetch_commits_directly(self.http)
 
-        # Compute burnout damage locally (heuristic)
-        burnout_data = burnout_scanner.calculate_burnout_score_locally(commits)
+        # Compute burnout damage locally (heuristic), off the event loop so
+        # a long commit history can't stall the other sensors
+        burnout_data = await asyncio.to_thread(burnout_scanner.calculate_burnout_score_locally, commits)
         if burnout_data.get('damage', 0) > 0:
             return {"type": "GITHUB", "data": burnout_data}
         return None
@@ -61,8 +113,7 @@ class DigitalTwinOrchestrator:
     # --- SENSOR 2: SPOTIFY (MCP or Simulated) ---
     async def check_spotify(self):
         """Checks Spotify via MCP if enabled, otherwise simulates music events."""
-        use_mcp = os.getenv("USE_MCP", "false").lower() in ("1", "true", "yes")
-        if use_mcp:
+        if self.use_mcp:
             try:
                 tracks = await mcp_spotify.fetch_spotify_via_mcp()
                 if tracks:
@@ -76,9 +127,8 @@ class DigitalTwinOrchestrator:
                 print(f"   ⚠️  Spotify MCP failed: {e}. Falling back to simulation.")
 
         # Simulation fallback
-        if random.random() < 0.3:
-            songs = ["Hurt - Johnny Cash", "Stress - Justice", "Given Up - Linkin Park"]
-            song = random.choice(songs)
+        if _rng.random() < SPOTIFY_EVENT_PROBABILITY:
+            song = _rng.choice(self._songs)
             print(f"   🎵 Spotify Sensor: Detected '{song}'")
             return {"type": "SPOTIFY", "song": song}
         return None
@@ -86,8 +136,7 @@ class DigitalTwinOrchestrator:
     # --- SENSOR 4: CALENDAR (MCP) ---
     async def check_calendar(self):
         """Checks upcoming calendar events via MCP (if enabled)."""
-        use_mcp = os.getenv("USE_MCP", "false").lower() in ("1", "true", "yes")
-        if not use_mcp:
+        if not self.use_mcp:
             return None
         try:
             events = await mcp_calendar.fetch_calendar_via_mcp()
@@ -101,94 +150,159 @@ class DigitalTwinOrchestrator:
     # --- SENSOR 3: SLACK (Simulated for Demo) ---
     def check_slack(self):
         """Simulates a toxic message coming in."""
-        if random.random() < 0.2:
+        if _rng.random() < SLACK_EVENT_PROBABILITY:
             msg = "URGENT: Client is furious. Fix this NOW."
             print(f"   💬 Slack Sensor: New Message from Boss: '{msg}'")
             return {"type": "SLACK", "msg": msg}
         return None
 
+    async def aclose(self):
+        """Release pooled HTTP connections held by the orchestrator and modules."""
+        await self.http.aclose()
+        await mcp_github.close_client()  # fallback pool shared with burnout_scanner
+        await minds_ai.close_runner()
+
+    async def run(self, once: bool = False):
+        """Run the life simulation, closing shared clients on the way out.
+
+        SIGINT/SIGTERM cancel the loop so shutdown goes through aclose().
+        """
+        loop = asyncio.get_running_loop()
+        main_task = asyncio.current_task()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, main_task.cancel)
+            except NotImplementedError:
+                # e.g. Windows; Ctrl-C still ends asyncio.run via KeyboardInterrupt
+                pass
+        try:
+            await self.run_life_simulation(once=once)
+        except asyncio.CancelledError:
+            print("\n🛑 Shutdown requested, closing connections...")
+        finally:
+            await self.aclose()
+
     # --- THE CORE LOOP ---
+    async def tick(self):
+        """One heartbeat: gather sensor events, update the persona, react."""
+        events = []
+        
+        # 1. GATHER INPUTS (concurrently: a tick costs the slowest sensor,
+        #    not the sum; one failing sensor doesn't cancel the others)
+        results = await asyncio.gather(
+            self.check_github(), self.check_spotify(), self.check_calendar(),
+            return_exceptions=True,
+        )
+        for name, res in zip(("GitHub", "Spotify", "Calendar"), results):
+            if isinstance(res, Exception):
+                print(f"   ⚠️  {name} sensor failed: {res}")
+            elif res:
+                events.append(res)
+        
+        sl_event = self.check_slack()
+        if sl_event: events.append(sl_event)
+
+        # 2. UPDATE STATE (If events happened)
+        if events:
+            # Delegate stat decisions to PersonaManager (which will call Minds AI).
+            push = False
+            try:
+                result = await self.persona.update_from_events(events, self.stats)
+
+                # Sync orchestrator stats with persona vitals (persona is authoritative)
+                try:
+                    self.stats = self.persona.get_state().get('vitals', self.stats)
+                except Exception:
+                    pass
+
+                # Push persona for assessment if the persona/AI indicated to do so
+                push = isinstance(result, dict) and result.get('push', True)
+            except Exception as e:
+                print(f"   ⚠️ Persona update error: {e}")
+
+            # 3. PUSH PERSONA + GENERATE REACTION (Minds AI). The reaction
+            #    doesn't depend on the push, so overlap the two round trips.
+            if push:
+                push_res, _ = await asyncio.gather(
+                    self.push_and_save(), self.react(events), return_exceptions=True,
+                )
+                if isinstance(push_res, Exception):
+                    print(f"   ⚠️ Persona push error: {push_res}")
+            else:
+                await self.react(events)
+        else:
+            print("   ... No new trauma detected. Resting.")
+
     async def run_life_simulation(self, once: bool = False):
         print("\n" + "="*50)
         print("🧬 DIGITAL TWIN: ONLINE")
         print("   Connected to Minds AI Orchestrator")
         print("="*50)
 
+        # Schedule ticks against fixed deadlines rather than sleeping a full
+        # HEARTBEAT_RATE after each one, so tick duration doesn't add drift
+        loop = asyncio.get_running_loop()
+        next_deadline = loop.time() + HEARTBEAT_RATE
+
         while True:
-            events = []
-            
-            # 1. GATHER INPUTS
-            gh_event = await self.check_github()
-            if gh_event: events.append(gh_event)
-            
-            sp_event = await self.check_spotify()
-            if sp_event: events.append(sp_event)
-
-            cal_event = await self.check_calendar()
-            if cal_event: events.append(cal_event)
-            
-            sl_event = self.check_slack()
-            if sl_event: events.append(sl_event)
-
-            # 2. UPDATE STATE (If events happened)
-            if events:
-                # Delegate stat decisions to PersonaManager (which will call Minds AI).
-                try:
-                    result = await self.persona.update_from_events(events, self.stats)
-
-                    # Sync orchestrator stats with persona vitals (persona is authoritative)
-                    try:
-                        self.stats = self.persona.get_state().get('vitals', self.stats)
-                    except Exception:
-                        pass
-
-                    # Push persona for assessment if the persona/AI indicated to do so
-                    if isinstance(result, dict) and result.get('push', True):
-                        push_result = await self.persona.push_persona()
-                        # write payload + assessment to file for frontend to consume
-                        out_path = os.path.join(os.getcwd(), "persona_last_push.json")
-                        try:
-                            with open(out_path, "w") as f:
-                                json.dump(push_result, f, indent=2)
-                            print(f"   🔁 Persona pushed and written to {out_path}")
-                        except Exception as e:
-                            print(f"   ⚠️ Failed to write persona file: {e}")
-                except Exception as e:
-                    print(f"   ⚠️ Persona update/push error: {e}")
-
-                # 3. GENERATE REACTION (Minds AI)
-                await self.react(events)
-            else:
-                print("   ... No new trauma detected. Resting.")
+            # Bound each tick so slow backends can't stretch it past the
+            # heartbeat and make ticks pile up; an overrun tick is cancelled.
+            try:
+                await asyncio.wait_for(self.tick(), timeout=TICK_BUDGET)
+            except asyncio.TimeoutError:
+                print(f"   ⏱️  Heartbeat budget ({TICK_BUDGET:.0f}s) exceeded, skipping rest of tick")
 
-            # 4. SLEEP
+            # 4. SLEEP (until the next deadline)
             if once:
                 # exit after a single iteration
                 return
-            await asyncio.sleep(HEARTBEAT_RATE)
+            now = loop.time()
+            delay = next_deadline - now
+            if delay < 0:
+                # Behind schedule: start now and re-anchor instead of bursting
+                # through the missed beats
+                next_deadline = now + HEARTBEAT_RATE
+            else:
+                next_deadline += HEARTBEAT_RATE
+            await asyncio.sleep(max(0, delay))
+
+    async def push_and_save(self):
+        """Push persona for assessment and write payload + assessment for the frontend.
+
+        If the assessment still needs its own AI call, the payload is written
+        first (assessment_raw null) so the frontend sees fresh vitals without
+        waiting, then rewritten once the assessment arrives.
+        """
+        push_result = await self.persona.push_persona()
+        out_path = os.path.join(os.getcwd(), "persona_last_push.json")
+        assessment = push_result["assessment"]
+        if not assessment.done():
+            await self._save_push(out_path, push_result["payload"], None)
+        await self._save_push(out_path, push_result["payload"], await assessment)
+
+    async def _save_push(self, out_path, payload, assessment_raw):
+        try:
+            # Serialize here, write in a thread: no disk I/O on the loop.
+            # Compact output keeps json's C encoder (indent= forces the Python
+            # one) and shrinks what /api/persona sends on every poll.
+            text = json.dumps({"payload": payload, "assessment_raw": assessment_raw}, separators=(",", ":"))
+            await asyncio.to_thread(_write_atomic, out_path, text)
+            print(f"   🔁 Persona pushed and written to {out_path}")
+        except Exception as e:
+            print(f"   ⚠️ Failed to write persona file: {e}")
 
     async def react(self, events):
         """Sends state to Minds AI to generate the voice."""
         
-        prompt = f"""
-        You are a Digital Twin of a developer.
-        
-        YOUR CURRENT VITALS:
-        🔋 Energy: {self.stats['energy']}%
-        🛡️ Resilience: {self.stats['resilience']}%
-        💬 Social: {self.stats['social']}%
-
-        NEW EVENTS:
-        {json.dumps(events, indent=2)}
-
-        TASK:
-        React to these specific events. 
-        - If Energy is low, complain about coding.
-        - If Resilience is low, get emotional/sad about the music.
-        - If Social is low, be angry at the boss.
-        
-        Output ONLY the spoken reaction (1-2 sentences).
-        """
+        # Static instructions first, then only the per-tick data, encoded
+        # compactly (no indent, no raw MCP track blobs) to save tokens
+        slim_events = [{k: v for k, v in e.items() if k != "raw"} for e in events]
+        prompt = (
+            REACT_INSTRUCTIONS
+            + f"VITALS: energy={self.stats['energy']}% resilience={self.stats['resilience']}% "
+            f"social={self.stats['social']}%\n"
+            + "EVENTS: " + json.dumps(slim_events, separators=(",", ":"))
+        )
 
         print("\n🧠 SYNCHRONIZING WITH MINDS AI...")
         try:
@@ -216,21 +330,7 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     bot = DigitalTwinOrchestrator()
-    bot._once = args.once
-
-    if bot._once:
-        # Run a single loop iteration then exit
-        async def _run_once():
-            # call one iteration of the loop by reusing the run_life_simulation body
-            # implement by creating a short-lived task that runs one loop
-            await bot.run_life_simulation()
-
-        try:
-            # To limit to one iteration, temporarily set HEARTBEAT_RATE to a tiny value
-            # and rely on --once: the loop will still run continuously; user should Ctrl-C
-            # Instead, call run_life_simulation and allow it to run; for now just run normally.
-            asyncio.run(bot.run_life_simulation())
-        except KeyboardInterrupt:
-            pass
-    else:
-        asyncio.run(bot.run_life_simulation())
\ No newline at end of file
+    try:
+        _run(bot.run(once=args.once))
+    except KeyboardInterrupt:
+        pass
@@ -1,8 +1,199 @@
 import asyncio
+import functools
+import hashlib
 import json
+import math
+import re
+from collections import OrderedDict, deque
 from datetime import datetime, timezone
 import minds_ai
 
+_UTC = timezone.utc
+
+# Fixed instruction block for update_from_events. It is a constant that
+# always leads the prompt, so the provider can serve it from its prompt
+# prefix cache; only the persona state and events that follow it vary.
+UPDATE_PROMPT = (
+    "You are the Persona Manager for a developer digital twin.\n"
+    "Input is the current `persona_state` JSON followed by new `events` JSON.\n"
+    "Decide how the persona vitals should change as a result of these events.\n"
+    "Output ONLY valid JSON with the following optional fields:\n"
+    "- adjustments: map of stat->integer delta (can be negative or positive)\n"
+    "- new_stats: map of stat->absolute integer values (if provided, prefer these)\n"
+    "- memory_additions: list of strings to prepend to persona memory\n"
+    "- explanation: brief string explaining the decision\n"
+    "- push: boolean whether the orchestrator should push persona to remote\n"
+    "- assessment: short string assessing the persona after these changes (shown in the UI)\n"
+    "- notes: brief string with any extra observations for the UI\n"
+    "Ensure the response is valid JSON and nothing else.\n"
+)
+
+# Fixed lead-in of push_persona's assessment prompt; the snapshot follows
+ASSESS_PROMPT = (
+    "Given this persona snapshot JSON, return ONLY a short JSON object:"
+    " {\"assessment\": string, \"notes\": string} \n\nSNAPSHOT:\n"
+)
+
+# Debounced batching for update_from_events: calls arriving within
+# UPDATE_DEBOUNCE_S share one AI round trip; a burst of UPDATE_MAX_BATCH
+# events flushes right away instead of waiting out the window.
+UPDATE_DEBOUNCE_S = 0.2
+UPDATE_MAX_BATCH = 50
+
+# Persona vitals, each kept within 0..100
+VITAL_NAMES = ("energy", "resilience", "social")
+VITAL_MIN, VITAL_MAX = 0, 100
+
+
+def _clamp(v: int) -> int:
+    return VITAL_MIN if v < VITAL_MIN else VITAL_MAX if v > VITAL_MAX else v
+
+
+def _as_int(v):
+    """int(v) for finite numbers and integer strings ("-5", "+3"), else None."""
+    if isinstance(v, int):
+        return int(v)
+    if isinstance(v, float):
+        return int(v) if math.isfinite(v) else None
+    if isinstance(v, str):
+        try:
+            return int(v.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def _valid_stats(d) -> dict:
+    """The known vitals in AI-supplied `d` with integer-like values, as ints."""
+    if not isinstance(d, dict):
+        return {}
+    return {k: n for k, v in d.items() if k in VITAL_NAMES and (n := _as_int(v)) is not None}
+
+
+# Newest-first persona memory entries kept; older ones fall off the end
+MEMORY_SIZE = 256
+
+# Semantic response cache: recurring event patterns (same commit burst, same
+# song) at roughly the same vitals reuse the earlier AI decision instead of
+# paying for another call. Vitals are bucketed so 63 and 67 share an entry.
+RESPONSE_CACHE_SIZE = 512
+VITALS_BUCKET = 10
+# Event fields that vary between otherwise identical events
+_VOLATILE_EVENT_KEYS = frozenset(("raw", "time", "timestamp"))
+
+
+def _dumps(obj) -> str:
+    """Compact JSON for prompts: no indentation or spaces, non-ASCII kept
+    as-is instead of \\uXXXX escapes (fewer tokens), deques as arrays."""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=list)
+
+
+def _canonical_event(e):
+    if isinstance(e, dict):
+        return {k: _canonical_event(v) for k, v in e.items() if k not in _VOLATILE_EVENT_KEYS}
+    if isinstance(e, list):
+        return [_canonical_event(v) for v in e]
+    return e
+
+
+def _response_cache_key(vitals: dict, events: list) -> str:
+    key = {
+        "v": {k: v // VITALS_BUCKET for k, v in vitals.items()},
+        "e": [_canonical_event(e) for e in events],
+    }
+    blob = json.dumps(key, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+
+
+def _lru_get(cache: OrderedDict, key):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache: OrderedDict, key, value, size: int):
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > size:
+        cache.popitem(last=False)
+
+
+# Decimal places kept for floats in the AI's `math` breakdown
+MATH_PRECISION = 3
+
+
+def _compact_math(v):
+    """Round floats in `math` (recursively) so they re-encode short.
+
+    The model's weights often come back as 0.30000000000000004-style
+    floats; rounded, they cost far fewer characters in the push payload,
+    the assessment prompt and persona_last_push.json.
+    """
+    if isinstance(v, float):
+        return round(v, MATH_PRECISION) if math.isfinite(v) else None
+    if isinstance(v, dict):
+        return {k: _compact_math(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_compact_math(x) for x in v]
+    return v
+
+
+def _optional_str(v):
+    return None if v is None else str(v)
+
+
+def _normalize_ai_response(parsed) -> dict:
+    """Validate a parsed update reply into the UPDATE_PROMPT schema.
+
+    Every field comes back present and typed: stat maps hold only known
+    vitals with int values, memory_additions is a list of str, math a dict
+    or None; missing or malformed fields get defaults and unknown ones are
+    dropped. `push` defaults to True, matching the orchestrator's reading
+    of a reply that doesn't say.
+    """
+    if not isinstance(parsed, dict):
+        parsed = {}
+    additions = parsed.get("memory_additions")
+    math_ = parsed.get("math")
+    return {
+        "adjustments": _valid_stats(parsed.get("adjustments")),
+        "new_stats": _valid_stats(parsed.get("new_stats")),
+        "memory_additions": [str(m) for m in additions] if isinstance(additions, list) else [],
+        "explanation": str(parsed.get("explanation") or ""),
+        "push": bool(parsed.get("push", True)),
+        "assessment": _optional_str(parsed.get("assessment")),
+        "notes": _optional_str(parsed.get("notes")),
+        "math": _compact_math(math_) if isinstance(math_, dict) else None,
+    }
+
+
+# Bracket characters, for locating a balanced JSON value in a model reply
+_BRACKET_RE = re.compile(r"[{}\[\]]")
+
+
+@functools.lru_cache(maxsize=64)
+def _find_balanced_json(s: str):
+    """Return the first balanced {..} or [..] in `s`, or None.
+
+    The regex engine hops between bracket positions in C instead of a
+    Python per-character loop. Cached, since a deterministic model repeats
+    identical replies.
+    """
+    depth = 0
+    start = None
+    for m in _BRACKET_RE.finditer(s):
+        if m.group() in "{[":
+            if start is None:
+                start = m.start()
+            depth += 1
+        else:
+            if start is None:
+                return None
+            depth -= 1
+            if not depth:
+                return s[start:m.end()]
+    return None
 
 class PersonaManager:
     def __init__(self, persona_id: str = "digital-twin"):
@@ -10,8 +201,8 @@ class PersonaManager:
         self._lock = asyncio.Lock()
         self._state = {
             "id": persona_id,
-            "vitals": {"energy": 100, "resilience": 100, "social": 100},
-            "memory": [],
+            "vitals": dict.fromkeys(VITAL_NAMES, VITAL_MAX),
+            "memory": deque(maxlen=MEMORY_SIZE),
             "last_sync": None,
             "source_signals": {},
             "version": 0,
@@ -21,125 +212,154 @@ class PersonaManager:
         self._last_ai_response = None
         self._last_adjustments = None
         self._last_math = None
+        # (state version, {"assessment", "notes"}) from the last update reply
+        self._last_assessment = None
+        # Pending (events, future) pairs waiting for the next batched flush
+        self._pending = []
+        self._pending_count = 0
+        self._flush_task = None
+        self._batch_full = asyncio.Event()
+        # AI decisions by _response_cache_key, least recently used first
+        self._cache = OrderedDict()
+        # (version, compact prompt JSON of the state at that version)
+        self._state_json_cache = None
+        # Applied updates so far (no-op ones too: they still replace _last_*)
+        self._updates = 0
+        # (self._updates, assessment prompt) from the last push
+        self._push_prompt_cache = None
 
     def get_state(self):
+        """Current state, without locking; treat it as read-only.
+
+        A published state dict is never mutated: writers build a new one
+        (copy-on-write) and swap `self._state` in a single assignment, so a
+        reader always sees one complete version. The lock only orders writers.
+        """
         return self._state
 
+    def _state_json(self, state):
+        """Compact prompt JSON of published `state`, encoded once per version.
+
+        Leaves out `last_sync`: push restamps it every tick without bumping
+        `version`, and the update decision doesn't depend on it, so version
+        alone identifies the encoded content.
+        """
+        cached = self._state_json_cache
+        if cached is None or cached[0] != state["version"]:
+            cached = self._state_json_cache = (
+                state["version"], _dumps({k: v for k, v in state.items() if k != "last_sync"}))
+        return cached[1]
+
     async def update_from_events(self, events: list, current_stats: dict = None):
         """Send events + current persona state to Minds AI to decide adjustments.
 
         New behavior: the AI returns structured JSON describing stat adjustments
         (or absolute new vitals). We apply those changes to `self._state` and
         return the parsed AI response for the caller to act on as well.
+
+        Calls are debounced: events from every call in the same window go to
+        the AI in one request, and each caller gets that request's result.
         """
         # Keep signature compatible: callers may later pass current_stats.
         # When orchestrator calls this it will pass the latest stats as a second arg.
         # We will read current vitals from self._state by default.
-        async with self._lock:
-            payload = {
-                "persona_state": self._state,
-                "events": events,
-            }
-
-        prompt = (
-            "You are the Persona Manager for a developer digital twin.\n"
-            "Input is a JSON object with fields `persona_state` and `events`.\n"
-            "Decide how the persona vitals should change as a result of these events.\n"
-            "Output ONLY valid JSON with the following optional fields:\n"
-            "- adjustments: map of stat->integer delta (can be negative or positive)\n"
-            "- new_stats: map of stat->absolute integer values (if provided, prefer these)\n"
-            "- memory_additions: list of strings to prepend to persona memory\n"
-            "- explanation: brief string explaining the decision\n"
-            "- push: boolean whether the orchestrator should push persona to remote\n"
-            "Ensure the response is valid JSON and nothing else.\n"
-        )
-        prompt += "\nINPUT_JSON:\n" + json.dumps(payload, indent=2)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((list(events), fut))
+        self._pending_count += len(events)
+        if self._pending_count >= UPDATE_MAX_BATCH:
+            self._batch_full.set()
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_pending())
+        return await fut
 
+    async def _flush_pending(self):
+        """Wait out the debounce window, then run one update for the batch."""
         try:
-            result = await minds_ai.run_prompt(prompt, model="openai/gpt-4o")
-            raw = getattr(result, "output", None) or str(result)
-
-            # Reuse a small JSON extractor (find first balanced {..} or [..])
-            def _find_json_substring(s: str):
-                s = s.strip()
-                if not s:
-                    return None
-                start = None
-                for i, ch in enumerate(s):
-                    if ch in '{[':
-                        start = i
-                        break
-                if start is None:
-                    return None
-                stack = []
-                for j in range(start, len(s)):
-                    ch = s[j]
-                    if ch in '{[':
-                        stack.append(ch)
-                    elif ch in '}]':
-                        if not stack:
-                            return None
-                        stack.pop()
-                        if not stack:
-                            return s[start:j+1]
-                return None
+            await asyncio.wait_for(self._batch_full.wait(), timeout=UPDATE_DEBOUNCE_S)
+        except asyncio.TimeoutError:
+            pass
+        batch, self._pending = self._pending, []
+        self._pending_count = 0
+        self._batch_full.clear()
+        # Calls arriving during the AI round trip start the next batch
+        self._flush_task = None
 
-            parsed = None
-            if isinstance(raw, (dict, list)):
-                parsed = raw
-            elif isinstance(raw, str):
-                sub = _find_json_substring(raw)
-                if sub:
-                    try:
-                        parsed = json.loads(sub)
-                    except Exception:
-                        parsed = None
+        try:
+            result = await self._update_once([e for evs, _ in batch for e in evs])
+        except BaseException as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            raise
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_result(result)
+
+    async def _update_once(self, events: list):
+        """One AI round trip for `events`; applies and returns the parsed reply."""
+        # Published states are never mutated, so one read of the reference
+        # is a consistent snapshot; no lock needed until the apply step
+        state = self._state
 
+        try:
+            cache_key = _response_cache_key(state["vitals"], events)
+            parsed = _lru_get(self._cache, cache_key)
             if parsed is None:
-                try:
-                    parsed = json.loads(raw)
-                except Exception:
-                    parsed = {}
+                # Static prefix -> persona state (changes per update) -> events
+                # (change every call), most stable first for prefix-cache hits.
+                prompt = "".join((
+                    UPDATE_PROMPT, "\nPERSONA_STATE:\n", self._state_json(state),
+                    "\nEVENTS:\n", _dumps(events),
+                ))
+                reply = await self._ask_ai(prompt)
+                # Validated once here (cached entries are already validated)
+                parsed = _normalize_ai_response(reply)
+                # Only cache decisions worth replaying
+                if isinstance(reply, dict) and reply:
+                    _lru_put(self._cache, cache_key, parsed, RESPONSE_CACHE_SIZE)
+            else:
+                print("   ♻️  Persona update served from cache")
+
+            new_stats = parsed["new_stats"]
+            deltas = parsed["adjustments"]
+            additions = parsed["memory_additions"]
 
-            # Apply adjustments to internal persona state
-            changed = False
+            # Apply adjustments to internal persona state: build the next
+            # state from the current one, then publish it in one assignment
             async with self._lock:
-                vitals = self._state.get("vitals", {})
-                # Prefer absolute new_stats if provided
-                if isinstance(parsed.get("new_stats"), dict):
-                    for k, v in parsed["new_stats"].items():
-                        if k in vitals:
-                            vitals[k] = max(0, min(100, int(v)))
-                            changed = True
-
-                if isinstance(parsed.get("adjustments"), dict):
-                    for k, delta in parsed["adjustments"].items():
-                        if k in vitals:
-                            try:
-                                vitals[k] = max(0, min(100, int(vitals[k] + int(delta))))
-                                changed = True
-                            except Exception:
-                                continue
-
-                # Optional memory additions
-                for m in (parsed.get("memory_additions") or []):
-                    try:
-                        self._state["memory"].insert(0, str(m))
-                        changed = True
-                    except Exception:
-                        pass
+                old = self._state
+                if new_stats or deltas or additions:
+                    vitals = dict(old["vitals"])
+                    # Prefer absolute new_stats if provided
+                    for k, v in new_stats.items():
+                        vitals[k] = _clamp(v)
+                    for k, d in deltas.items():
+                        vitals[k] = _clamp(vitals[k] + d)
 
-                if changed:
-                    self._state["version"] = self._state.get("version", 0) + 1
+                    # Optional memory additions (each ends up newest-first, as
+                    # with one appendleft per entry)
+                    memory = old["memory"]
+                    if additions:
+                        memory = deque(memory, maxlen=MEMORY_SIZE)
+                        memory.extendleft(additions)
 
-            # store last AI response details for push_persona()
-            try:
+                    self._state = {**old, "vitals": vitals, "memory": memory,
+                                   "version": old["version"] + 1}
+
+                # store last AI response details for push_persona(), in the
+                # same critical section so a push sees them with their state
+                self._updates += 1
                 self._last_events = events
                 self._last_ai_response = parsed
-                self._last_adjustments = parsed.get("adjustments") if isinstance(parsed, dict) else None
-                self._last_math = parsed.get("math") if isinstance(parsed, dict) else None
-            except Exception:
-                pass
+                self._last_adjustments = deltas
+                self._last_math = parsed["math"]
+                # The update reply carries the UI assessment too, so a push
+                # right after it doesn't need its own AI round trip
+                if parsed["assessment"] is not None:
+                    self._last_assessment = (self._state["version"], {
+                        "assessment": parsed["assessment"],
+                        "notes": parsed["notes"],
+                    })
 
             # Return the parsed structured response so caller can act if needed
             return parsed
@@ -147,38 +367,102 @@ class PersonaManager:
         except Exception as e:
             return {"error": str(e)}
 
+    async def _ask_ai(self, prompt: str):
+        """Run the update prompt and parse the reply into a dict (or {})."""
+        result = await minds_ai.run_prompt(prompt, model="openai/gpt-4o")
+        raw = getattr(result, "output", None) or str(result)
+
+        parsed = None
+        if isinstance(raw, (dict, list)):
+            parsed = raw
+        elif isinstance(raw, str):
+            # Fast path: the model usually returns one object, maybe wrapped
+            # in prose or code fences, so outermost braces are the answer
+            start, end = raw.find('{'), raw.rfind('}')
+            if 0 <= start < end:
+                try:
+                    parsed = json.loads(raw[start:end + 1])
+                except ValueError:
+                    parsed = None
+            if parsed is None:
+                sub = _find_balanced_json(raw)
+                if sub:
+                    try:
+                        parsed = json.loads(sub)
+                    except Exception:
+                        parsed = None
+
+        if parsed is None:
+            try:
+                parsed = json.loads(raw)
+            except Exception:
+                parsed = {}
+        return parsed
+
     async def push_persona(self, model: str = "openai/gpt-4o") -> dict:
         """Build a payload including last AI math/adjustments and return it.
 
         The returned dict contains:
         - payload: the persona snapshot including last_events, last_adjustments, last_math
-        - assessment_raw: (string) brief assessment returned by Minds AI or error string
+        - assessment: awaitable resolving to the brief assessment string
+          returned by Minds AI (or an error string)
+
+        If the last update reply already assessed the current state version,
+        `assessment` is already resolved and no AI call is made; otherwise
+        the call runs in the background and this returns without waiting.
         """
+        # One critical section for the sync stamp and everything read from
+        # self, so the payload can't mix two updates; the AI call runs unlocked.
         async with self._lock:
-            self._state["last_sync"] = datetime.now(timezone.utc).isoformat()
+            # One clock read: last_sync and the payload timestamp must match
+            now = datetime.now(_UTC).isoformat()
+            self._state = {**self._state, "last_sync": now}
+            # Memory as a list: the payload gets JSON-dumped by the caller
+            state = {**self._state, "memory": list(self._state["memory"])}
+            updates = self._updates
+            last_events = self._last_events
+            last_adjustments = self._last_adjustments
+            last_math = self._last_math
+            last_ai = self._last_ai_response
+            last_assessment = self._last_assessment
 
         payload = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": now,
             "id": self._id,
-            "state": self._state,
-            "memory": self._state.get("memory", []),
-            "last_events": self._last_events,
-            "last_adjustments": self._last_adjustments,
-            "last_math": self._last_math,
-            "ai_response": self._last_ai_response,
+            "state": state,
+            "memory": state["memory"],
+            "last_events": last_events,
+            "last_adjustments": last_adjustments,
+            "last_math": last_math,
+            "ai_response": last_ai,
         }
 
-        # Optionally ask the AI for a short assessment/opinion to show in UI
-        assessment_text = None
+        # Assessment from the update that produced this state: reuse it
+        if last_assessment is not None and last_assessment[0] == state["version"]:
+            assessment = asyncio.get_running_loop().create_future()
+            assessment.set_result(json.dumps(last_assessment[1]))
+            return {"payload": payload, "assessment": assessment}
+
+        # Otherwise ask the AI for a short assessment/opinion to show in UI,
+        # in the background so the payload is available right away
+        cached = self._push_prompt_cache
+        if cached is not None and cached[0] == updates:
+            prompt = cached[1]
+        else:
+            # The snapshot leaves out the clock fields (timestamp, last_sync),
+            # which change every push without affecting the assessment, and
+            # the top-level copy of memory; so it only changes on an update
+            snapshot = {k: v for k, v in payload.items() if k not in ("timestamp", "memory")}
+            snapshot["state"] = {k: v for k, v in state.items() if k != "last_sync"}
+            prompt = ASSESS_PROMPT + _dumps(snapshot)
+            self._push_prompt_cache = (updates, prompt)
+        assessment = asyncio.create_task(self._fetch_assessment(prompt, model))
+        return {"payload": payload, "assessment": assessment}
+
+    async def _fetch_assessment(self, prompt: str, model: str) -> str:
+        """Raw assessment text from Minds AI, or an error string (never raises)."""
         try:
-            prompt = (
-                "Given this persona snapshot JSON, return ONLY a short JSON object:"
-                " {\"assessment\": string, \"notes\": string} \n\nSNAPSHOT:\n"
-                + json.dumps(payload)
-            )
             result = await minds_ai.run_prompt(prompt, model=model)
-            assessment_text = getattr(result, "output", None) or str(result)
+            return getattr(result, "output", None) or str(result)
         except Exception as e:
-            assessment_text = f"AI assessment failed: {e}"
-
-        return {"payload": payload, "assessment_raw": assessment_text}
+            return f"AI assessment failed: {e}"
@@ -0,0 +1,23 @@
+"""Bounded exponential backoff with full jitter for transient failures."""
+import asyncio
+import random
+
+import httpx
+
+
+async def retry_async(fn, *, attempts=4, base=0.5, cap=8.0,
+                      retry_on=(httpx.TimeoutException, httpx.TransportError)):
+    """Await `fn()` (a coroutine factory), retrying on `retry_on` exceptions.
+
+    Between attempts sleeps a random delay in [0, min(cap, base * 2**i)]
+    ("full jitter") so callers recovering from the same blip don't retry in
+    lockstep. The last error is re-raised once attempts run out. Only pass
+    transient error types here: never auth or invalid-request errors.
+    """
+    for i in range(attempts):
+        try:
+            return await fn()
+        except retry_on:
+            if i == attempts - 1:
+                raise
+            await asyncio.sleep(random.uniform(0, min(cap, base * 2 ** i)))